@@ -1,18 +1,78 @@
 # laticinios_armazem/app.py
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
-from datetime import datetime, timedelta, date
+from flask import Flask, render_template, request, redirect, url_for, flash, session, g, Response
+from flask_caching import Cache
+from flask_compress import Compress
+from jinja2 import FileSystemBytecodeCache
+from datetime import timedelta, date
 import functools
 import logging
+import orjson
+import os
+import secrets
+import time
 from models import (
     Usuario, ProdutoLacteo, AreaArmazem, Venda, ProdutoCatalogo,
-    popular_dados_iniciais, init_db 
+    popular_dados_iniciais, init_db, DATABASE_PATH, get_all_areas_with_products, get_area_with_products, produto_pertence_a_area,
+    get_total_stock, get_products_near_expiry, get_all_sales, get_funcao_usuario,
+    rollback_pending_transaction
 )
 
+# Modo de desenvolvimento (FLASK_DEBUG=1): servidor embutido com debug, HTTP puro.
+MODO_DEBUG = os.environ.get('FLASK_DEBUG') == '1'
+
 # Inicializa a aplicação Flask
 app = Flask(__name__)
-# Define uma chave secreta para a sessão. Em produção, use uma chave mais segura e gerada aleatoriamente.
-app.secret_key = 'chave_secreta_para_sessoes_flask_laticinios_minerva'
+# Chave secreta da sessão lida do ambiente. Precisa ser a mesma em todos os workers, então fora do
+# modo de desenvolvimento a aplicação não sobe sem ela. Em desenvolvimento (um processo) usa uma aleatória.
+app.secret_key = os.environ.get('SECRET_KEY')
+if not app.secret_key:
+    if not MODO_DEBUG:
+        raise RuntimeError("Defina a variável de ambiente SECRET_KEY (a mesma para todos os workers).")
+    app.secret_key = secrets.token_bytes(32)
+
+# O cookie de sessão é assinado: o username nele contido é confiável sem reverificar a senha.
+# Em desenvolvimento (FLASK_DEBUG=1, HTTP puro) o cookie não pode exigir HTTPS, senão o login não persiste.
+app.config.update(
+    SESSION_COOKIE_HTTPONLY=True,
+    SESSION_COOKIE_SECURE=not MODO_DEBUG,
+    PERMANENT_SESSION_LIFETIME=timedelta(hours=8)
+)
+
+# Cache dos objetos Usuario autenticados no login. A entrada dura o mesmo que a sessão e é renovada a
+# cada revalidação (ver usuario_autenticado), acompanhando o cookie permanente que também se renova.
+# Fica em disco para ser compartilhado entre os workers e nunca sofre poda (CACHE_THRESHOLD=0);
+# por isso também guarda as versões usadas para invalidar o cache de páginas.
+cache = Cache(app, config={
+    'CACHE_TYPE': 'FileSystemCache',
+    'CACHE_DIR': os.path.join(os.path.dirname(__file__), 'data', 'cache', 'usuarios'),
+    'CACHE_DEFAULT_TIMEOUT': int(app.config['PERMANENT_SESSION_LIFETIME'].total_seconds()),
+    'CACHE_THRESHOLD': 0
+})
+
+# Intervalo, em segundos, para reconferir no banco se o usuário ainda existe e mantém a mesma função.
+REVALIDAR_USUARIO_APOS = 300
+
+# Cache de respostas das páginas de listagem, separado do cache de usuários: entradas de versões
+# antigas se acumulam aqui e a poda por CACHE_THRESHOLD nunca descarta sessões.
+cache_paginas = Cache(app, config={
+    'CACHE_TYPE': 'FileSystemCache',
+    'CACHE_DIR': os.path.join(os.path.dirname(__file__), 'data', 'cache', 'paginas'),
+    'CACHE_DEFAULT_TIMEOUT': 60,
+    'CACHE_THRESHOLD': 500
+})
+
+# Compressão gzip das respostas HTML/JSON (relatórios e API de estoque são as maiores).
+app.config.update(
+    COMPRESS_MIMETYPES=['text/html', 'application/json', 'text/css', 'application/javascript'],
+    COMPRESS_LEVEL=6,
+    COMPRESS_MIN_SIZE=500
+)
+Compress(app)
+
+# Antecedência, em dias, para alertar sobre produtos próximos do vencimento.
+DIAS_ALERTA_VALIDADE = 7
+ALERTA_VALIDADE_DELTA = timedelta(days=DIAS_ALERTA_VALIDADE)
 
 # Configura o logging básico para a aplicação, útil para depuração.
 logging.basicConfig(level=logging.DEBUG)
@@ -26,7 +86,7 @@ def to_date_filter(value):
     if isinstance(value, date):
         return value
     try:
-        return datetime.strptime(value, '%Y-%m-%d').date()
+        return date.fromisoformat(value)
     except (ValueError, TypeError) as e:
         logging.error(f"Erro ao converter data: {value}, erro: {e}")
         return value
@@ -34,31 +94,77 @@ def to_date_filter(value):
 # Registra o filtro personalizado no ambiente Jinja2 da aplicação.
 app.jinja_env.filters['to_date'] = to_date_filter
 
-# Inicializa o banco de dados (cria tabelas se não existirem).
-init_db()
+# Guarda o bytecode dos templates compilados em disco, evitando recompilá-los a cada novo processo.
+# Sem diretório explícito o Jinja usa um diretório por usuário (modo 0700) e verifica o dono dele,
+# impedindo que outro usuário da máquina plante bytecode a ser executado pela aplicação.
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+
+def precompilar_templates():
+    """Carrega todos os templates na inicialização para que o primeiro request não pague a compilação."""
+    for nome_template in app.jinja_env.list_templates():
+        app.jinja_env.get_template(nome_template)
 
-# Popula o banco de dados com dados iniciais (se ainda não estiver populado).
-popular_dados_iniciais()
+precompilar_templates()
+
+# --- Inicialização do Banco de Dados ---
+@app.cli.command('initdb')
+def comando_initdb():
+    """Cria as tabelas e índices do banco de dados (flask --app app initdb)."""
+    init_db()
+
+@app.cli.command('seed')
+def comando_seed():
+    """Popula o banco de dados com os dados iniciais (flask --app app seed)."""
+    popular_dados_iniciais()
+
+@app.teardown_appcontext
+def encerrar_conexao_db(exc=None):
+    """Garante que nenhuma transação do request fique aberta na conexão reaproveitada pela thread."""
+    rollback_pending_transaction()
 
 # --- Autenticação e Controle de Acesso ---
+def chave_cache_usuario(username: str) -> str:
+    """Retorna a chave usada para guardar o objeto Usuario autenticado no cache."""
+    return f"user:{username}"
+
+def guardar_usuario_no_cache(usuario):
+    """Guarda o Usuario (criado pelo próprio modelo em verificar_senha) com o instante da última validação."""
+    cache.set(chave_cache_usuario(usuario.username), {'usuario': usuario, 'validado_em': time.time()})
+
+def usuario_autenticado(username: str):
+    """Retorna o Usuario da sessão ou None se ela não vale mais.
+    A cada REVALIDAR_USUARIO_APOS segundos confere a função no banco (leitura pela chave primária, sem a
+    senha): usuário excluído ou com função alterada precisa fazer login de novo.
+    """
+    entrada = cache.get(chave_cache_usuario(username))
+    if entrada is None:
+        return None
+    usuario = entrada['usuario']
+    if time.time() - entrada['validado_em'] >= REVALIDAR_USUARIO_APOS:
+        if get_funcao_usuario(username) != usuario.funcao:
+            cache.delete(chave_cache_usuario(username))
+            return None
+        guardar_usuario_no_cache(usuario)
+    return usuario
+
 def login_necessario(permissao_requerida: str = None):
     """Decorador para proteger rotas que exigem login e, opcionalmente, uma permissão específica."""
     def decorator(view_func):
         @functools.wraps(view_func)
         def wrapper(*args, **kwargs):
-            if 'username' not in session or 'password' not in session: # Verifica também a senha na sessão
+            if 'username' not in session:
                 flash("Por favor, faça login para acessar esta página.", "warning")
                 return redirect(url_for('login', next=request.url))
             
-            usuario_logado = Usuario.verificar_senha(session['username'], session.get('password'))
+            # A senha só é verificada no login; aqui basta o usuário guardado no cache (revalidado periodicamente)
+            usuario_logado = usuario_autenticado(session['username'])
             if not usuario_logado:
                 session.clear()
                 flash("Sua sessão é inválida ou expirou. Por favor, faça login novamente.", "danger")
                 return redirect(url_for('login'))
 
-            # Armazena o objeto usuário na sessão para uso pelo context_processor
-            # session['usuario_obj'] = usuario_logado # Não é ideal armazenar objetos complexos diretamente na sessão
-                                                # O context_processor deve buscar o objeto a cada request se necessário.
+            # Disponibiliza o usuário para o restante do request (inclusive o context_processor)
+            g.usuario_logado = usuario_logado
 
             if permissao_requerida and not usuario_logado.tem_permissao(permissao_requerida):
                 flash("Você não tem permissão para realizar esta ação ou acessar esta página.", "danger")
@@ -80,7 +186,8 @@ def login():
             session['username'] = usuario.username
             session['user_funcao'] = usuario.funcao # Mantido para referência rápida, mas o objeto é rei
             session['user_nome'] = usuario.nome   # Mantido para referência rápida
-            session['password'] = senha # ATENÇÃO: Prática insegura para produção.
+            session.permanent = True
+            guardar_usuario_no_cache(usuario)
             app.logger.debug(f"Sessão criada para usuário: {usuario.username}")
             flash(f"Login bem-sucedido! Bem-vindo(a), {usuario.nome}.", "success")
             
@@ -97,10 +204,81 @@ def login():
 @app.route('/logout')
 def logout():
     """Rota para logout de usuários."""
+    if 'username' in session:
+        cache.delete(chave_cache_usuario(session['username']))
     session.clear()
     flash("Você foi desconectado com sucesso.", "info")
     return redirect(url_for('login'))
 
+def data_hoje() -> date:
+    """Retorna a data de hoje, calculada uma única vez por request e compartilhada com os templates."""
+    if 'data_hoje' not in g:
+        g.data_hoje = date.today()
+    return g.data_hoje
+
+# --- Cache de Páginas ---
+def versao_dados(chave: str) -> str:
+    """Lê a versão atual de um conjunto de dados em cache (páginas, catálogo), compartilhada entre os workers."""
+    return cache.get(chave) or ''
+
+def nova_versao_dados(chave: str):
+    """Grava uma versão nova e única, sem expiração, invalidando o que foi cacheado com a anterior.
+    Um valor aleatório (e não um contador) nunca volta a coincidir com uma versão já usada.
+    """
+    cache.set(chave, secrets.token_hex(8), timeout=0)
+
+def chave_cache_pagina() -> str:
+    """Monta a chave de cache de uma resposta: versão dos dados, caminho e usuário logado."""
+    versao = versao_dados('versao_paginas')
+    return f"pagina:{versao}:{request.path}:{session.get('username', '')}"
+
+def ha_mensagens_pendentes() -> bool:
+    """Indica se há mensagens flash a exibir; nesse caso a página não pode vir do cache."""
+    return '_flashes' in session
+
+def invalidar_cache_paginas():
+    """Descarta todas as páginas em cache após uma alteração no banco de dados."""
+    nova_versao_dados('versao_paginas')
+
+# Catálogo para o dropdown de produtos, mantido em memória do processo por até CATALOGO_TTL segundos.
+# Alterações feitas neste processo valem na hora; as feitas por outro worker, em até CATALOGO_TTL.
+CATALOGO_TTL = 30
+_catalogo_cache = {'dados': None, 'expira_em': 0.0}
+
+def catalogo_dropdown() -> dict:
+    """Retorna {id_produto: {'nome': ...}} do catálogo sem I/O enquanto a cópia em memória for válida."""
+    agora = time.monotonic()
+    dados = _catalogo_cache['dados']
+    if dados is None or agora >= _catalogo_cache['expira_em']:
+        dados = {pc.id_produto: {'nome': pc.nome} for pc in ProdutoCatalogo.listar_todos()}
+        _catalogo_cache['dados'] = dados
+        _catalogo_cache['expira_em'] = agora + CATALOGO_TTL
+    return dados
+
+def invalidar_cache_catalogo():
+    """Descarta a cópia do catálogo deste processo após uma alteração."""
+    _catalogo_cache['dados'] = None
+
+# --- Validação de Formulários ---
+# Campos obrigatórios de cada rota que recebe formulário, na ordem em que a rota os utiliza.
+CAMPOS_OBRIGATORIOS = {
+    'adicionar_produto_na_area': ('id_produto_catalogo', 'quantidade', 'data_validade', 'lote'),
+    'vender_produto_da_area': ('id_instancia_venda', 'quantidade_venda', 'destino_venda'),
+    'adicionar_area': ('id_area', 'nome', 'tipo_armazenamento'),
+    'editar_area': ('nome', 'tipo_armazenamento'),
+    'adicionar_produto_catalogo': ('id_produto', 'nome'),
+    'editar_produto_catalogo': ('nome',),
+    'editar_produto_em_area': ('quantidade', 'data_validade', 'lote'),
+}
+
+def extrair_campos(form, campos: tuple) -> tuple:
+    """Lê os campos do formulário uma única vez.
+    Retorna (campos faltando, valores na mesma ordem de `campos`).
+    """
+    valores = tuple(form.get(campo) for campo in campos)
+    faltando = [campo for campo, valor in zip(campos, valores) if not valor]
+    return faltando, valores
+
 # --- Rotas Principais da Aplicação ---
 @app.route('/')
 @login_necessario()
@@ -110,6 +288,7 @@ def index_redirect():
 
 @app.route('/armazem')
 @login_necessario(permissao_requerida='visualizar_armazem')
+@cache_paginas.cached(timeout=60, key_prefix=chave_cache_pagina, unless=ha_mensagens_pendentes)
 def pagina_inicial_armazem():
     """Rota para a página inicial do armazém, exibe todas as áreas."""
     areas = AreaArmazem.listar_todas()
@@ -125,14 +304,13 @@ def detalhes_da_area(id_area):
         return redirect(url_for('pagina_inicial_armazem'))
     
     produtos_na_area = sorted(area.listar_produtos(), key=lambda p: p.data_validade)
-    produtos_catalogo_list = ProdutoCatalogo.listar_todos()
-    produtos_catalogo_dropdown = {pc.id_produto: {'nome': pc.nome} for pc in produtos_catalogo_list}
+    produtos_catalogo_dropdown = catalogo_dropdown()
 
     return render_template('area_detalhes.html', 
                          area=area, 
                          produtos=produtos_na_area,
                          produtos_catalogo=produtos_catalogo_dropdown,
-                         data_hoje=date.today()
+                         data_hoje=data_hoje()
                         )
 
 @app.route('/armazem/<id_area>/adicionar_produto', methods=['POST'])
@@ -145,12 +323,10 @@ def adicionar_produto_na_area(id_area):
         return redirect(url_for('pagina_inicial_armazem'))
 
     try:
-        id_catalogo_produto = request.form.get('id_produto_catalogo')
-        quantidade_str = request.form.get('quantidade')
-        data_validade_str = request.form.get('data_validade')
-        lote = request.form.get('lote')
+        faltando, valores = extrair_campos(request.form, CAMPOS_OBRIGATORIOS['adicionar_produto_na_area'])
+        id_catalogo_produto, quantidade_str, data_validade_str, lote = valores
 
-        if not all([id_catalogo_produto, quantidade_str, data_validade_str, lote]):
+        if faltando:
             flash("Todos os campos são obrigatórios para adicionar o produto.", "warning")
             return redirect(url_for('detalhes_da_area', id_area=id_area))
 
@@ -172,6 +348,7 @@ def adicionar_produto_na_area(id_area):
             lote=lote.strip().upper()
         )
         area.adicionar_produto(novo_produto)
+        invalidar_cache_paginas()
         flash(f"Produto '{novo_produto.nome}' (Lote: {novo_produto.lote}) adicionado/atualizado com sucesso na área {area.nome}!", "success")
     
     except ValueError as e: 
@@ -192,11 +369,10 @@ def vender_produto_da_area(id_area):
         return redirect(url_for('pagina_inicial_armazem'))
 
     try:
-        id_instancia_venda_str = request.form.get('id_instancia_venda') 
-        quantidade_venda_str = request.form.get('quantidade_venda')
-        destino_venda = request.form.get('destino_venda')
+        faltando, valores = extrair_campos(request.form, CAMPOS_OBRIGATORIOS['vender_produto_da_area'])
+        id_instancia_venda_str, quantidade_venda_str, destino_venda = valores
 
-        if not all([id_instancia_venda_str, quantidade_venda_str, destino_venda]):
+        if faltando:
             flash("Informações insuficientes para registrar a venda.", "warning")
             return redirect(url_for('detalhes_da_area', id_area=id_area))
         
@@ -213,7 +389,7 @@ def vender_produto_da_area(id_area):
             flash(f"Produto com ID de instância '{id_instancia_venda}' não encontrado.", "danger")
             return redirect(url_for('detalhes_da_area', id_area=id_area))
         
-        produto_na_area_correta = any(p.id == id_instancia_venda for p in area.listar_produtos())
+        produto_na_area_correta = produto_pertence_a_area(id_instancia_venda, id_area)
         if not produto_na_area_correta:
             flash(f"Produto com ID de instância '{id_instancia_venda}' não pertence à área '{area.nome}'.", "danger")
             return redirect(url_for('detalhes_da_area', id_area=id_area))
@@ -235,7 +411,10 @@ def vender_produto_da_area(id_area):
                 area_origem_id=id_area,
                 usuario_responsavel=session['username']
             )
+            # Atenção: se data_hora for gravada como 'DD/MM/AAAA HH:MM:SS', o trigger trg_vendas_data_hora_iso
+            # (schema.sql) a reescreve em ISO-8601 logo após o INSERT; get_all_sales depende desse formato.
             Venda.registrar(nova_venda)
+            invalidar_cache_paginas()
             flash(f"Venda de {quantidade_venda} unidade(s) de '{produto_para_venda.nome}' (Lote: {produto_para_venda.lote}) registrada com sucesso!", "success")
         else:
             flash(f"Falha ao tentar vender {quantidade_venda} unidade(s) de '{produto_para_venda.nome}'. Verifique o estoque ou ID do produto.", "danger")
@@ -252,6 +431,7 @@ def vender_produto_da_area(id_area):
 
 @app.route('/admin/areas')
 @login_necessario(permissao_requerida='gerenciar_areas')
+@cache_paginas.cached(timeout=60, key_prefix=chave_cache_pagina, unless=ha_mensagens_pendentes)
 def listar_areas_admin():
     """Rota para listar todas as áreas de armazenamento para administração."""
     areas = AreaArmazem.listar_todas()
@@ -262,15 +442,15 @@ def listar_areas_admin():
 def adicionar_area():
     """Rota para adicionar uma nova área de armazenamento."""
     if request.method == 'POST':
-        id_area = request.form.get('id_area')
-        nome = request.form.get('nome')
-        tipo_armazenamento = request.form.get('tipo_armazenamento')
+        faltando, valores = extrair_campos(request.form, CAMPOS_OBRIGATORIOS['adicionar_area'])
+        id_area, nome, tipo_armazenamento = valores
 
-        if not all([id_area, nome, tipo_armazenamento]):
+        if faltando:
             flash("Todos os campos são obrigatórios.", "warning")
         else:
             nova_area = AreaArmazem.criar(id_area.strip().upper(), nome.strip(), tipo_armazenamento)
             if nova_area:
+                invalidar_cache_paginas()
                 flash(f"Área '{nova_area.nome}' adicionada com sucesso!", "success")
                 return redirect(url_for('listar_areas_admin'))
             else:
@@ -287,13 +467,14 @@ def editar_area(id_area_original):
         return redirect(url_for('listar_areas_admin'))
 
     if request.method == 'POST':
-        novo_nome = request.form.get('nome')
-        novo_tipo_armazenamento = request.form.get('tipo_armazenamento')
+        faltando, valores = extrair_campos(request.form, CAMPOS_OBRIGATORIOS['editar_area'])
+        novo_nome, novo_tipo_armazenamento = valores
 
-        if not all([novo_nome, novo_tipo_armazenamento]):
+        if faltando:
             flash("Nome e Tipo de Armazenamento são obrigatórios.", "warning")
         else:
             if area.atualizar(novo_nome.strip(), novo_tipo_armazenamento):
+                invalidar_cache_paginas()
                 flash(f"Área '{area.nome}' atualizada com sucesso!", "success")
                 return redirect(url_for('listar_areas_admin'))
             else:
@@ -310,6 +491,7 @@ def excluir_area(id_area):
     else:
         sucesso, mensagem = area.deletar()
         if sucesso:
+            invalidar_cache_paginas()
             flash(mensagem, "success")
         else:
             flash(mensagem, "danger")
@@ -317,6 +499,7 @@ def excluir_area(id_area):
 
 @app.route('/admin/catalogo')
 @login_necessario(permissao_requerida='gerenciar_catalogo_produtos')
+@cache_paginas.cached(timeout=60, key_prefix=chave_cache_pagina, unless=ha_mensagens_pendentes)
 def listar_produtos_catalogo_admin():
     """Rota para listar todos os produtos do catálogo para administração."""
     produtos = ProdutoCatalogo.listar_todos()
@@ -327,14 +510,16 @@ def listar_produtos_catalogo_admin():
 def adicionar_produto_catalogo():
     """Rota para adicionar um novo produto ao catálogo."""
     if request.method == 'POST':
-        id_produto = request.form.get('id_produto')
-        nome = request.form.get('nome')
+        faltando, valores = extrair_campos(request.form, CAMPOS_OBRIGATORIOS['adicionar_produto_catalogo'])
+        id_produto, nome = valores
 
-        if not all([id_produto, nome]):
+        if faltando:
             flash("ID do Produto e Nome são obrigatórios.", "warning")
         else:
             novo_produto = ProdutoCatalogo.criar(id_produto.strip().upper(), nome.strip())
             if novo_produto:
+                invalidar_cache_paginas()
+                invalidar_cache_catalogo()
                 flash(f"Produto '{novo_produto.nome}' adicionado ao catálogo com sucesso!", "success")
                 return redirect(url_for('listar_produtos_catalogo_admin'))
             else:
@@ -351,11 +536,15 @@ def editar_produto_catalogo(id_produto_catalogo):
         return redirect(url_for('listar_produtos_catalogo_admin'))
 
     if request.method == 'POST':
-        novo_nome = request.form.get('nome')
-        if not novo_nome:
+        faltando, valores = extrair_campos(request.form, CAMPOS_OBRIGATORIOS['editar_produto_catalogo'])
+        novo_nome, = valores
+
+        if faltando:
             flash("O nome do produto é obrigatório.", "warning")
         else:
             if produto.atualizar(novo_nome.strip()):
+                invalidar_cache_paginas()
+                invalidar_cache_catalogo()
                 flash(f"Produto '{produto.nome}' atualizado com sucesso!", "success")
                 return redirect(url_for('listar_produtos_catalogo_admin'))
             else:
@@ -372,6 +561,8 @@ def excluir_produto_catalogo(id_produto_catalogo):
     else:
         sucesso, mensagem = produto.deletar()
         if sucesso:
+            invalidar_cache_paginas()
+            invalidar_cache_catalogo()
             flash(mensagem, "success")
         else:
             flash(mensagem, "danger")
@@ -391,17 +582,16 @@ def editar_produto_em_area(id_area, id_instancia_produto):
         flash(f"Instância de produto com ID '{id_instancia_produto}' não encontrada.", "danger")
         return redirect(url_for('detalhes_da_area', id_area=id_area))
     
-    produto_encontrado_na_area = any(p.id == id_instancia_produto for p in area.listar_produtos())
+    produto_encontrado_na_area = produto_pertence_a_area(id_instancia_produto, id_area)
     if not produto_encontrado_na_area:
         flash(f"Produto com ID de instância '{id_instancia_produto}' não pertence à área '{area.nome}'.", "danger")
         return redirect(url_for('detalhes_da_area', id_area=id_area))
 
     if request.method == 'POST':
-        nova_quantidade_str = request.form.get('quantidade')
-        nova_data_validade_str = request.form.get('data_validade')
-        novo_lote = request.form.get('lote')
+        faltando, valores = extrair_campos(request.form, CAMPOS_OBRIGATORIOS['editar_produto_em_area'])
+        nova_quantidade_str, nova_data_validade_str, novo_lote = valores
 
-        if not all([nova_quantidade_str, nova_data_validade_str, novo_lote]):
+        if faltando:
             flash("Todos os campos (Quantidade, Data de Validade, Lote) são obrigatórios.", "warning")
         else:
             try:
@@ -409,6 +599,7 @@ def editar_produto_em_area(id_area, id_instancia_produto):
                 if nova_quantidade < 0: 
                     flash("A quantidade não pode ser negativa.", "warning")
                 elif produto_instancia.atualizar_instancia(nova_quantidade, nova_data_validade_str, novo_lote.strip().upper()):
+                    invalidar_cache_paginas()
                     flash(f"Produto '{produto_instancia.nome}' (Lote: {produto_instancia.lote}) atualizado com sucesso na área {area.nome}!", "success")
                     return redirect(url_for('detalhes_da_area', id_area=id_area))
                 else:
@@ -437,10 +628,11 @@ def excluir_produto_de_area(id_area, id_instancia_produto):
     if not produto_instancia:
         flash(f"Instância de produto com ID '{id_instancia_produto}' não encontrada.", "danger")
     else:
-        produto_na_area_correta = any(p.id == id_instancia_produto for p in area.listar_produtos())
+        produto_na_area_correta = produto_pertence_a_area(id_instancia_produto, id_area)
         if not produto_na_area_correta:
             flash(f"Produto com ID de instância '{id_instancia_produto}' não pertence à área '{area.nome}'.", "danger")
         elif produto_instancia.deletar_instancia():
+            invalidar_cache_paginas()
             flash(f"Produto '{produto_instancia.nome}' (Lote: {produto_instancia.lote}) excluído com sucesso da área {area.nome}!", "success")
         else:
             flash(f"Erro ao excluir o produto '{produto_instancia.nome}' da área.", "danger")
@@ -451,74 +643,80 @@ def excluir_produto_de_area(id_area, id_instancia_produto):
 @login_necessario(permissao_requerida='gerente')
 def pagina_relatorios():
     """Rota para a página de relatórios."""
-    estoque_total = {}
-    for area_obj in AreaArmazem.listar_todas():
-        for prod_instancia in area_obj.listar_produtos():
-            chave_produto = prod_instancia.id_catalogo_produto 
-            if chave_produto not in estoque_total:
-                estoque_total[chave_produto] = {"nome": prod_instancia.nome, "quantidade_total": 0}
-            estoque_total[chave_produto]["quantidade_total"] += prod_instancia.quantidade
+    estoque_total = {
+        row['id_catalogo_produto']: {"nome": row['nome'], "quantidade_total": row['quantidade_total']}
+        for row in get_total_stock()
+    }
     
-    vendas = sorted([v.to_dict() for v in Venda.listar_todas()], key=lambda x: datetime.strptime(x['data_hora'], '%d/%m/%Y %H:%M:%S'), reverse=True)
-
-    dias_alerta_antecedencia = 7 
-    data_hoje_obj = date.today()
-    limite_alerta = data_hoje_obj + timedelta(days=dias_alerta_antecedencia)
-    produtos_alerta_validade = []
-
-    for area_obj in AreaArmazem.listar_todas():
-        for produto_obj in area_obj.listar_produtos(): 
-            status_validade = ""
-            dias_para_vencer_calc = (produto_obj.data_validade - data_hoje_obj).days
-
-            if produto_obj.data_validade < data_hoje_obj:
-                status_validade = "VENCIDO"
-            elif produto_obj.data_validade <= limite_alerta:
-                status_validade = "PROXIMO_VENCIMENTO"
-            
-            if status_validade:
-                produtos_alerta_validade.append({
-                    "area_id": area_obj.id_area,
-                    "nome_area": area_obj.nome,
-                    "produto": produto_obj.to_dict(), 
-                    "status_validade": status_validade,
-                    "dias_para_vencer": dias_para_vencer_calc
-                })
-    
-    produtos_alerta_validade.sort(key=lambda x: (x["status_validade"] != "VENCIDO", x["dias_para_vencer"]))
+    # Já ordenadas pelo banco; as chaves são os campos de Venda (os mesmos de Venda.to_dict())
+    vendas = [dict(row) for row in get_all_sales()]
+
+    data_hoje_obj = data_hoje()
+    limite_alerta = data_hoje_obj + ALERTA_VALIDADE_DELTA
+
+    # O banco já filtra e ordena pela validade (índice idx_prod_validade): vencidos primeiro
+    produtos_alerta_validade = [
+        {
+            "area_id": row['id_area'],
+            "nome_area": row['nome_area'],
+            "produto": {
+                "id": row['id'],
+                "id_catalogo_produto": row['id_catalogo_produto'],
+                "nome": row['nome'],
+                "quantidade": row['quantidade'],
+                "data_validade": row['data_validade'],
+                "lote": row['lote']
+            },
+            "status_validade": "VENCIDO" if row['dias_para_vencer'] < 0 else "PROXIMO_VENCIMENTO",
+            "dias_para_vencer": row['dias_para_vencer']
+        }
+        for row in get_products_near_expiry(data_hoje_obj, limite_alerta)
+    ]
 
     return render_template('relatorios.html', 
                          estoque_total=estoque_total, 
                          vendas_registradas=vendas, 
                          produtos_alerta_validade=produtos_alerta_validade,
-                         dias_alerta=dias_alerta_antecedencia)
+                         dias_alerta=DIAS_ALERTA_VALIDADE)
+
+def resposta_json(dados, status: int = 200) -> Response:
+    """Serializa os dados com orjson (mais rápido que o json da stdlib).
+    As chaves saem ordenadas, como no jsonify; datas saem em ISO-8601 (AAAA-MM-DD), não no formato HTTP.
+    """
+    return Response(orjson.dumps(dados, option=orjson.OPT_SORT_KEYS), status=status, mimetype='application/json')
 
 @app.route('/api/armazem/<id_area>/produtos', methods=['GET'])
 @login_necessario(permissao_requerida='visualizar_armazem')
 def api_produtos_por_area(id_area):
     """Endpoint da API para listar produtos de uma área específica em formato JSON."""
-    area = AreaArmazem.buscar_por_id(id_area)
-    if not area:
-        return jsonify({"erro": "Área não encontrada"}), 404
-    return jsonify(area.to_dict())
+    area = get_area_with_products(id_area)  # Mesmo formato de cada item de /api/estoque_geral
+    if area is None:
+        return resposta_json({"erro": "Área não encontrada"}, 404)
+    return resposta_json(area)
 
 @app.route('/api/estoque_geral', methods=['GET'])
 @login_necessario(permissao_requerida='gerente')
+@cache_paginas.cached(timeout=60, key_prefix=chave_cache_pagina, unless=ha_mensagens_pendentes)
 def api_estoque_geral():
     """Endpoint da API para listar o estoque completo de todas as áreas em formato JSON."""
-    estoque_completo = [area.to_dict() for area in AreaArmazem.listar_todas()]
-    return jsonify(estoque_completo)
+    estoque_completo = get_all_areas_with_products()
+    return resposta_json(estoque_completo)
 
 # --- Context Processor ---
 @app.context_processor
 def injetar_dados_globais():
     """Disponibiliza o objeto Usuario logado para todos os templates."""
-    usuario_obj = None
-    if 'username' in session and 'password' in session: # Verifica se há um usuário logado
-        # Busca o objeto Usuario completo para disponibilizar seus métodos (como tem_permissao)
-        usuario_obj = Usuario.verificar_senha(session['username'], session['password'])
-    return dict(usuario_logado=usuario_obj, data_hoje_global=date.today())
+    # O objeto Usuario já foi resolvido por login_necessario neste request
+    return dict(usuario_logado=getattr(g, 'usuario_logado', None), data_hoje_global=data_hoje())
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5001)
+    # Em desenvolvimento (um único processo) o banco é preparado aqui: o schema.sql é idempotente
+    # e aplica índices/migrações novos; os dados iniciais só entram num banco recém-criado.
+    # Em produção isso é feito uma vez com `flask initdb`/`flask seed`, antes de subir os workers.
+    banco_novo = not os.path.exists(DATABASE_PATH)
+    init_db()
+    if banco_novo:
+        popular_dados_iniciais()
+    # Servidor de desenvolvimento do Flask; em produção use o gunicorn (ver README).
+    app.run(debug=MODO_DEBUG, host='0.0.0.0', port=5001)
 
@@ -1,45 +1,74 @@
 import sqlite3
 import os
+import threading
 from werkzeug.security import generate_password_hash, check_password_hash
 
 # Definir caminho do banco de dados
 DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'laticinios.db')
 
+# Uma conexão por thread, reaproveitada entre requisições (evita abrir/fechar o arquivo a cada consulta).
+# O reaproveitamento só acontece com um pool fixo de threads (ex.: gunicorn --threads); no servidor de
+# desenvolvimento cada request roda numa thread nova, que abre a própria conexão e a libera ao terminar.
+_conexoes = threading.local()
+
+class _ConexaoDaThread(sqlite3.Connection):
+    # Quem ainda faz conn.close() (padrão antigo) descarta a conexão da thread; a próxima chamada abre outra
+    def close(self):
+        if getattr(_conexoes, 'conn', None) is self:
+            _conexoes.conn = None
+        super().close()
+
 def get_db_connection():
-    os.makedirs(os.path.join(os.path.dirname(__file__), 'data'), exist_ok=True)
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row  # Permite acessar colunas pelo nome
+    conn = getattr(_conexoes, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
+        # Consultas são strings fixas com parâmetros '?', então o cache de statements preparados é reaproveitado
+        conn = sqlite3.connect(DATABASE_PATH, cached_statements=256, factory=_ConexaoDaThread)
+        conn.row_factory = sqlite3.Row  # Permite acessar colunas pelo nome
+        conn.execute("PRAGMA journal_mode=WAL")  # Leitores concorrentes não bloqueiam a escrita
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-20000")  # ~20 MB de cache de páginas
+        _conexoes.conn = conn
     return conn
 
+def rollback_pending_transaction():
+    # Chamada ao fim de cada request: desfaz uma escrita que ficou aberta (ex.: erro antes do commit),
+    # para que a conexão reaproveitada não segure o lock de escrita do SQLite no request seguinte
+    conn = getattr(_conexoes, 'conn', None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
 def init_db():
     # Inicializa o banco de dados usando o schema.sql
     conn = get_db_connection()
     with open(os.path.join(os.path.dirname(__file__), 'schema.sql'), 'r') as f:
         conn.executescript(f.read())
     conn.commit()
-    conn.close()
     print("Banco de dados inicializado com sucesso")
 
 # ------- Funções para usuários -------
 def create_user(username, password, role='user'):
     conn = get_db_connection()
     try:
-        conn.execute(
-            "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
-            (username, generate_password_hash(password), role)
-        )
-        conn.commit()
+        with conn:  # Commit automático ou rollback em caso de erro
+            conn.execute(
+                "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                (username, generate_password_hash(password), role)
+            )
     except sqlite3.IntegrityError:
-        conn.close()
         return False  # Indica falha (ex: usuário já existe)
-    conn.close()
     return True  # Indica sucesso
 
 def get_user_by_username(username):
     conn = get_db_connection()
-    user = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
-    conn.close()
-    return user
+    return conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+
+def get_funcao_usuario(username):
+    # Função atual do usuário (ou None se ele não existe mais), lida pela chave primária e sem a senha
+    conn = get_db_connection()
+    row = conn.execute("SELECT funcao FROM usuarios WHERE username = ?", (username,)).fetchone()
+    return row['funcao'] if row else None
 
 def check_user_password(username, password):
     user = get_user_by_username(username)
@@ -51,19 +80,107 @@ def check_user_password(username, password):
 def add_area(nome, descricao=''):
     conn = get_db_connection()
     try:
-        conn.execute(
-            "INSERT INTO areas_armazen (nome, descricao) VALUES (?, ?)",
-            (nome, descricao)
-        )
-        conn.commit()
+        with conn:
+            conn.execute(
+                "INSERT INTO areas_armazen (nome, descricao) VALUES (?, ?)",
+                (nome, descricao)
+            )
     except sqlite3.IntegrityError:
-        conn.close()
         return False
-    conn.close()
     return True
 
 def get_all_areas():
     conn = get_db_connection()
-    areas = conn.execute("SELECT * FROM areas_armazen").fetchall()
-    conn.close()
-    return areas
+    return conn.execute("SELECT * FROM areas_armazen").fetchall()
+
+# Áreas com seus produtos numa única consulta (evita N+1). É o formato JSON das rotas /api/estoque_geral
+# e /api/armazem/<id_area>/produtos: áreas por id_area e produtos da mais próxima à mais distante validade
+AREAS_COM_PRODUTOS_SQL = """SELECT a.id_area, a.nome, a.tipo_armazenamento,
+                  p.id AS produto_id, p.id_catalogo_produto, p.nome AS produto_nome,
+                  p.quantidade, p.data_validade, p.lote
+           FROM areas_armazem a
+           LEFT JOIN produtos_areas p ON p.id_area = a.id_area"""
+
+def _group_products_by_area(rows):
+    areas = {}
+    for row in rows:
+        area = areas.get(row['id_area'])
+        if area is None:
+            area = areas[row['id_area']] = {
+                'id_area': row['id_area'],
+                'nome': row['nome'],
+                'tipo_armazenamento': row['tipo_armazenamento'],
+                'produtos': []
+            }
+        if row['produto_id'] is not None:  # LEFT JOIN: área sem produtos
+            area['produtos'].append({
+                'id': row['produto_id'],
+                'id_catalogo_produto': row['id_catalogo_produto'],
+                'nome': row['produto_nome'],
+                'quantidade': row['quantidade'],
+                'data_validade': row['data_validade'],
+                'lote': row['lote']
+            })
+    return list(areas.values())
+
+def get_all_areas_with_products():
+    conn = get_db_connection()
+    rows = conn.execute(AREAS_COM_PRODUTOS_SQL + " ORDER BY a.id_area, p.data_validade").fetchall()
+    return _group_products_by_area(rows)
+
+def get_area_with_products(id_area):
+    # Mesmo formato de get_all_areas_with_products, para uma única área (None se não existir)
+    conn = get_db_connection()
+    rows = conn.execute(
+        AREAS_COM_PRODUTOS_SQL + " WHERE a.id_area = ? ORDER BY p.data_validade", (id_area,)
+    ).fetchall()
+    areas = _group_products_by_area(rows)
+    return areas[0] if areas else None
+
+# ------- Funções para produtos nas áreas -------
+def produto_pertence_a_area(id_instancia, id_area):
+    # Verifica a posse com uma consulta de uma linha, sem carregar os produtos da área
+    conn = get_db_connection()
+    row = conn.execute(
+        "SELECT 1 FROM produtos_areas WHERE id = ? AND id_area = ? LIMIT 1",
+        (id_instancia, id_area)
+    ).fetchone()
+    return row is not None
+
+def get_total_stock():
+    # Soma o estoque de cada produto do catálogo em todas as áreas
+    conn = get_db_connection()
+    return conn.execute(
+        """SELECT id_catalogo_produto, MIN(nome) AS nome, SUM(quantidade) AS quantidade_total
+           FROM produtos_areas
+           GROUP BY id_catalogo_produto"""
+    ).fetchall()
+
+def get_products_near_expiry(hoje, limite):
+    # Produtos vencidos ou que vencem até 'limite', já ordenados (vencidos primeiro, depois os mais próximos).
+    # Validades fora do formato AAAA-MM-DD (julianday NULL) ficam de fora, pois não há dias_para_vencer
+    conn = get_db_connection()
+    return conn.execute(
+        """SELECT p.id, p.id_catalogo_produto, p.nome, p.quantidade, p.data_validade, p.lote,
+                  a.id_area, a.nome AS nome_area,
+                  CAST(julianday(p.data_validade) - julianday(?) AS INTEGER) AS dias_para_vencer
+           FROM produtos_areas p
+           JOIN areas_armazem a ON a.id_area = p.id_area
+           WHERE p.data_validade <= ? AND julianday(p.data_validade) IS NOT NULL
+           ORDER BY p.data_validade""",
+        (hoje.isoformat(), limite.isoformat())
+    ).fetchall()
+
+# ------- Funções para vendas -------
+def get_all_sales():
+    # Vendas mais recentes primeiro; a ordenação usa o valor ISO armazenado (índice idx_vendas_data)
+    # e a data/hora já sai formatada para exibição. O schema.sql converte para ISO as vendas gravadas
+    # como DD/MM/AAAA; um valor em formato inesperado é devolvido como está, em vez de NULL, e vai para o fim
+    conn = get_db_connection()
+    return conn.execute(
+        """SELECT id, id_catalogo_produto, nome, lote, data_validade_produto, quantidade_vendida,
+                  destino, area_origem_id, usuario_responsavel,
+                  COALESCE(strftime('%d/%m/%Y %H:%M:%S', data_hora), data_hora) AS data_hora
+           FROM vendas
+           ORDER BY strftime('%s', vendas.data_hora) IS NULL, vendas.data_hora DESC"""
+    ).fetchall()
@@ -50,4 +50,28 @@ CREATE TABLE IF NOT EXISTS vendas (
     FOREIGN KEY (id_catalogo_produto) REFERENCES produtos_catalogo(id_produto),
     FOREIGN KEY (area_origem_id) REFERENCES areas_armazem(id_area),
     FOREIGN KEY (usuario_responsavel) REFERENCES usuarios(username)
-);
\ No newline at end of file
+);
+
+-- Índice para o relatório de produtos próximos do vencimento
+CREATE INDEX IF NOT EXISTS idx_prod_validade ON produtos_areas(data_validade);
+
+-- Índice para listar as vendas da mais recente para a mais antiga
+CREATE INDEX IF NOT EXISTS idx_vendas_data ON vendas(data_hora DESC);
+
+-- Índice para o estoque total por produto e para a verificação de uso de um produto do catálogo
+-- (produtos_areas(id_area) já é coberto pelo UNIQUE(id_area, id_catalogo_produto, lote))
+CREATE INDEX IF NOT EXISTS idx_prod_catalogo ON produtos_areas(id_catalogo_produto);
+
+-- Vendas gravadas como 'DD/MM/AAAA HH:MM:SS' são convertidas para ISO-8601 ('AAAA-MM-DD HH:MM:SS'),
+-- formato em que a ordenação por texto coincide com a cronológica (usada com idx_vendas_data).
+UPDATE vendas
+SET data_hora = substr(data_hora, 7, 4) || '-' || substr(data_hora, 4, 2) || '-' || substr(data_hora, 1, 2) || substr(data_hora, 11)
+WHERE data_hora GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]*';
+
+CREATE TRIGGER IF NOT EXISTS trg_vendas_data_hora_iso AFTER INSERT ON vendas
+WHEN NEW.data_hora GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]*'
+BEGIN
+    UPDATE vendas
+    SET data_hora = substr(NEW.data_hora, 7, 4) || '-' || substr(NEW.data_hora, 4, 2) || '-' || substr(NEW.data_hora, 1, 2) || substr(NEW.data_hora, 11)
+    WHERE id = NEW.id;
+END;
\ No newline at end of file
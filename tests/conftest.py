@@ -0,0 +1,20 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models  # noqa: E402
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    """Banco novo, criado a partir do schema.sql, num arquivo temporário."""
+    monkeypatch.setattr(models, 'DATABASE_PATH', str(tmp_path / 'laticinios.db'))
+    monkeypatch.setattr(models, '_conexoes', threading.local())
+    models.init_db()
+    conexao = models.get_db_connection()
+    yield conexao
+    conexao.close()
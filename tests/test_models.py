@@ -0,0 +1,162 @@
+from datetime import date, timedelta
+
+import models
+
+HOJE = date(2026, 1, 10)
+LIMITE = HOJE + timedelta(days=7)
+
+
+def inserir_area(conn, id_area, nome, tipo='refrigerado'):
+    conn.execute("INSERT INTO areas_armazem (id_area, nome, tipo_armazenamento) VALUES (?, ?, ?)",
+                 (id_area, nome, tipo))
+
+
+def inserir_produto(conn, id_area, id_catalogo, nome, quantidade, validade, lote):
+    cur = conn.execute(
+        """INSERT INTO produtos_areas (id_area, id_catalogo_produto, nome, quantidade, data_validade, lote)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        (id_area, id_catalogo, nome, quantidade, validade.isoformat(), lote))
+    return cur.lastrowid
+
+
+def inserir_venda(conn, data_hora):
+    conn.execute(
+        """INSERT INTO vendas (id_catalogo_produto, nome, lote, data_validade_produto, quantidade_vendida,
+                               destino, area_origem_id, usuario_responsavel, data_hora)
+           VALUES ('LEITE01', 'Leite', 'L1', '2026-02-01', 1, 'Mercado', 'A1', 'gerente', ?)""",
+        (data_hora,))
+
+
+def test_get_products_near_expiry_limites_e_ordem(conn):
+    inserir_area(conn, 'A1', 'Câmara Fria')
+    inserir_produto(conn, 'A1', 'LEITE01', 'Leite', 5, LIMITE + timedelta(days=1), 'FORA')
+    inserir_produto(conn, 'A1', 'LEITE01', 'Leite', 5, LIMITE, 'NO_LIMITE')
+    inserir_produto(conn, 'A1', 'LEITE01', 'Leite', 5, HOJE, 'HOJE')
+    inserir_produto(conn, 'A1', 'LEITE01', 'Leite', 5, HOJE - timedelta(days=1), 'VENCIDO')
+    conn.commit()
+
+    rows = models.get_products_near_expiry(HOJE, LIMITE)
+
+    assert [(r['lote'], r['dias_para_vencer']) for r in rows] == [
+        ('VENCIDO', -1), ('HOJE', 0), ('NO_LIMITE', 7)
+    ]
+    assert rows[0]['nome_area'] == 'Câmara Fria'
+
+
+def test_get_products_near_expiry_ignora_validade_invalida(conn):
+    inserir_area(conn, 'A1', 'Câmara Fria')
+    inserir_produto(conn, 'A1', 'LEITE01', 'Leite', 5, HOJE, 'OK')
+    conn.execute(
+        """INSERT INTO produtos_areas (id_area, id_catalogo_produto, nome, quantidade, data_validade, lote)
+           VALUES ('A1', 'LEITE01', 'Leite', 5, '10/01/2026', 'INVALIDA')""")
+    conn.commit()
+
+    rows = models.get_products_near_expiry(HOJE, LIMITE)
+
+    assert [(r['lote'], r['dias_para_vencer']) for r in rows] == [('OK', 0)]
+
+
+def test_get_total_stock_soma_entre_areas(conn):
+    inserir_area(conn, 'A1', 'Câmara Fria')
+    inserir_area(conn, 'A2', 'Depósito', 'seco')
+    inserir_produto(conn, 'A1', 'LEITE01', 'Leite', 5, HOJE, 'L1')
+    inserir_produto(conn, 'A2', 'LEITE01', 'Leite', 7, HOJE, 'L2')
+    inserir_produto(conn, 'A2', 'QUEIJO01', 'Queijo', 3, HOJE, 'Q1')
+    conn.commit()
+
+    estoque = {r['id_catalogo_produto']: (r['nome'], r['quantidade_total']) for r in models.get_total_stock()}
+
+    assert estoque == {'LEITE01': ('Leite', 12), 'QUEIJO01': ('Queijo', 3)}
+
+
+def test_get_all_areas_with_products_inclui_area_vazia(conn):
+    inserir_area(conn, 'A1', 'Câmara Fria')
+    inserir_area(conn, 'A2', 'Depósito', 'seco')
+    inserir_produto(conn, 'A1', 'LEITE01', 'Leite', 5, HOJE + timedelta(days=3), 'L2')
+    inserir_produto(conn, 'A1', 'LEITE01', 'Leite', 5, HOJE, 'L1')
+    conn.commit()
+
+    areas = models.get_all_areas_with_products()
+
+    assert [a['id_area'] for a in areas] == ['A1', 'A2']
+    assert [p['lote'] for p in areas[0]['produtos']] == ['L1', 'L2']
+    assert areas[1]['produtos'] == []
+
+
+def test_produto_pertence_a_area(conn):
+    inserir_area(conn, 'A1', 'Câmara Fria')
+    inserir_area(conn, 'A2', 'Depósito', 'seco')
+    id_produto = inserir_produto(conn, 'A1', 'LEITE01', 'Leite', 5, HOJE, 'L1')
+    conn.commit()
+
+    assert models.produto_pertence_a_area(id_produto, 'A1')
+    assert not models.produto_pertence_a_area(id_produto, 'A2')
+    assert not models.produto_pertence_a_area(id_produto + 1, 'A1')
+
+
+def test_get_all_sales_ordena_e_formata(conn):
+    inserir_venda(conn, '2026-01-05 10:00:00')
+    inserir_venda(conn, '01/03/2026 09:00:00')  # formato antigo, convertido para ISO pelo schema
+    inserir_venda(conn, '2025-12-31 23:59:59')
+    conn.commit()
+
+    assert [v['data_hora'] for v in models.get_all_sales()] == [
+        '01/03/2026 09:00:00', '05/01/2026 10:00:00', '31/12/2025 23:59:59'
+    ]
+
+
+def test_get_all_sales_mantem_valor_em_formato_desconhecido_no_fim(conn):
+    inserir_venda(conn, 'ontem')
+    inserir_venda(conn, '2025-12-31 23:59:59')
+    conn.commit()
+
+    assert [v['data_hora'] for v in models.get_all_sales()] == ['31/12/2025 23:59:59', 'ontem']
+
+
+def test_get_all_sales_usa_as_chaves_de_venda(conn):
+    # relatorios.html recebia Venda.to_dict(): os campos de Venda (argumentos de Venda(...) em app.py)
+    # mais id e data_hora
+    inserir_venda(conn, '2026-01-05 10:00:00')
+    conn.commit()
+
+    assert set(dict(models.get_all_sales()[0])) == {
+        'id', 'id_catalogo_produto', 'nome', 'lote', 'data_validade_produto', 'quantidade_vendida',
+        'destino', 'area_origem_id', 'usuario_responsavel', 'data_hora'
+    }
+
+
+def test_conexao_fechada_nao_e_reaproveitada(conn):
+    conn.close()  # padrão antigo: quem pediu a conexão a fecha
+
+    assert models.get_all_sales() == []
+
+
+def test_rollback_pending_transaction_desfaz_escrita_aberta(conn):
+    inserir_area(conn, 'A1', 'Câmara Fria')
+    assert conn.in_transaction
+
+    models.rollback_pending_transaction()
+
+    assert not conn.in_transaction
+    assert models.get_all_areas_with_products() == []
+
+
+def test_get_funcao_usuario(conn):
+    conn.execute("INSERT INTO usuarios (username, senha, funcao, nome) VALUES ('ana', 'hash', 'gerente', 'Ana')")
+    conn.commit()
+
+    assert models.get_funcao_usuario('ana') == 'gerente'
+    assert models.get_funcao_usuario('inexistente') is None
+
+
+def test_get_area_with_products_mesmo_formato_da_lista(conn):
+    inserir_area(conn, 'A1', 'Câmara Fria')
+    inserir_area(conn, 'A2', 'Depósito', 'seco')
+    inserir_produto(conn, 'A1', 'LEITE01', 'Leite', 5, HOJE, 'L1')
+    conn.commit()
+
+    todas = models.get_all_areas_with_products()
+
+    assert models.get_area_with_products('A1') == todas[0]
+    assert models.get_area_with_products('A2') == todas[1]
+    assert models.get_area_with_products('A9') is None